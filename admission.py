@@ -0,0 +1,219 @@
+import math
+import time
+import threading
+import logging
+from collections import OrderedDict
+from flask import request, jsonify, g
+from pdf_utils import scan_page_count
+
+logger = logging.getLogger(__name__)
+
+# Relative cost of each API endpoint, roughly proportional to CPU and disk used
+OPERATION_WEIGHTS = {
+    'convert_pdf_to_images': 8,
+    'convert_images_to_pdf': 4,
+    'compress_pdf': 3,
+    'merge_pdfs': 2,
+    'split_pdf': 2,
+    'reorder_pdf': 2,
+    'protect_pdf': 2,
+    'unlock_pdf': 2,
+    'check_pdf_encryption': 1,
+}
+
+# Long-lived event streams, limited by open streams instead of request slots and rate
+STREAM_ENDPOINTS = {'operation_progress'}
+
+# Client buckets kept in memory before the least recently seen are dropped
+MAX_TRACKED_CLIENTS = 10000
+
+class TokenBucket:
+    """Token bucket refilled continuously at rate tokens per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, cost):
+        """Take cost tokens, returning 0 on success or the seconds to wait"""
+        # A request bigger than the whole bucket is let through once it is full
+        cost = min(cost, self.capacity)
+        with self.lock:
+            self._refill()
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return 0
+            return (cost - self.tokens) / self.rate
+
+    def refund(self, cost):
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + min(cost, self.capacity))
+
+class AdmissionController:
+    """Per-client and global rate and concurrency limits for the API routes
+
+    State lives in the worker process, so with several gunicorn workers the
+    global limits apply per worker.
+    """
+
+    def __init__(self, config):
+        self.client_rate = config['ADMISSION_CLIENT_RATE']
+        self.client_burst = config['ADMISSION_CLIENT_BURST']
+        self.client_concurrency = config['ADMISSION_CLIENT_CONCURRENCY']
+        self.global_concurrency = config['ADMISSION_GLOBAL_CONCURRENCY']
+        self.client_streams = config['ADMISSION_CLIENT_STREAMS']
+        self.global_streams = config['ADMISSION_GLOBAL_STREAMS']
+        self.global_bucket = TokenBucket(config['ADMISSION_GLOBAL_RATE'], config['ADMISSION_GLOBAL_BURST'])
+        self.client_buckets = OrderedDict()
+        self.in_flight = {}
+        self.open_streams = {}
+        self.lock = threading.Lock()
+
+    def _client_bucket(self, client):
+        with self.lock:
+            bucket = self.client_buckets.get(client)
+            if bucket is None:
+                bucket = TokenBucket(self.client_rate, self.client_burst)
+                self.client_buckets[client] = bucket
+                if len(self.client_buckets) > MAX_TRACKED_CLIENTS:
+                    self.client_buckets.popitem(last=False)
+            else:
+                self.client_buckets.move_to_end(client)
+            return bucket
+
+    def _acquire(self, counts, client, client_limit, global_limit):
+        with self.lock:
+            if counts.get(client, 0) >= client_limit:
+                return 429
+            if sum(counts.values()) >= global_limit:
+                return 503
+            counts[client] = counts.get(client, 0) + 1
+            return None
+
+    def _release(self, counts, client):
+        with self.lock:
+            remaining = counts.get(client, 0) - 1
+            if remaining > 0:
+                counts[client] = remaining
+            else:
+                counts.pop(client, None)
+
+    def acquire_slot(self, client):
+        """Reserve a concurrency slot, returning None or the status to reject with"""
+        return self._acquire(self.in_flight, client, self.client_concurrency, self.global_concurrency)
+
+    def release_slot(self, client):
+        self._release(self.in_flight, client)
+
+    def acquire_stream(self, client):
+        """Reserve an event stream, returning None or the status to reject with"""
+        return self._acquire(self.open_streams, client, self.client_streams, self.global_streams)
+
+    def release_stream(self, client):
+        self._release(self.open_streams, client)
+
+    def admit(self, client, cost):
+        """Charge cost to the client and global buckets
+
+        Returns None when admitted, otherwise (status, retry_after_seconds).
+        """
+        client_bucket = self._client_bucket(client)
+
+        wait = client_bucket.consume(cost)
+        if wait:
+            return 429, wait
+
+        wait = self.global_bucket.consume(cost)
+        if wait:
+            client_bucket.refund(cost)
+            return 503, wait
+
+        return None
+
+def estimate_cost(endpoint):
+    """Estimate the cost of the current request from its type, size and pages"""
+    weight = OPERATION_WEIGHTS.get(endpoint, 1)
+    megabytes = (request.content_length or 0) / (1024 * 1024)
+
+    pages = 0
+    for file in request.files.values():
+        if file.filename and file.filename.lower().endswith('.pdf'):
+            pages += scan_page_count(file.stream)
+
+    return weight * (1 + megabytes + pages / 10)
+
+def reject(status, retry_after):
+    if status == 429:
+        message = 'Too many requests. Please wait before trying again.'
+    else:
+        message = 'The server is busy. Please try again shortly.'
+    response = jsonify({'error': message})
+    response.status_code = status
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+def init_admission(app):
+    """Register admission control in front of the /api/ routes"""
+    controller = AdmissionController(app.config)
+
+    @app.before_request
+    def admit_request():
+        if not request.path.startswith('/api/') or not app.config['ADMISSION_ENABLED']:
+            return None
+
+        client = request.remote_addr or 'unknown'
+
+        # Streams hold a worker thread for as long as they are open, so they
+        # get their own cap rather than a request slot
+        if request.endpoint in STREAM_ENDPOINTS:
+            status = controller.acquire_stream(client)
+            if status:
+                logger.warning(f"Rejected {request.endpoint} from {client}: too many open streams")
+                return reject(status, 1)
+            g.admission_stream_client = client
+            return None
+
+        # Concurrency is checked first so overload is rejected before the body is parsed
+        status = controller.acquire_slot(client)
+        if status:
+            logger.warning(f"Rejected {request.endpoint} from {client}: too many concurrent requests")
+            return reject(status, 1)
+        g.admission_client = client
+
+        cost = estimate_cost(request.endpoint)
+        rejection = controller.admit(client, cost)
+        if rejection:
+            status, retry_after = rejection
+            logger.warning(f"Rejected {request.endpoint} from {client}: cost {cost:.1f} over rate limit")
+            return reject(status, retry_after)
+
+        return None
+
+    @app.after_request
+    def hold_stream(response):
+        # The body is streamed after the request context ends, so the stream
+        # is released when the response is closed instead of at teardown
+        client = g.pop('admission_stream_client', None)
+        if client is not None:
+            response.call_on_close(lambda: controller.release_stream(client))
+        return response
+
+    @app.teardown_request
+    def release_request(exc):
+        client = g.pop('admission_client', None)
+        if client is not None:
+            controller.release_slot(client)
+        # Still set only when the request failed before a response was made
+        client = g.pop('admission_stream_client', None)
+        if client is not None:
+            controller.release_stream(client)
+
+    return controller
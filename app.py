@@ -9,19 +9,44 @@ logging.basicConfig(level=logging.DEBUG)
 # Create the app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+# Proxies in front of the app whose X-Forwarded-For is trusted. Admission
+# control keys clients on the resulting address, so leave this at 0 unless
+# the app is only reachable through that many proxies.
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ.get('PROXY_HOPS', 0)), x_proto=1, x_host=1)
 
 # Configure upload settings
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024  # 50MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['PROCESSED_FOLDER'] = 'processed'
+app.config['PROGRESS_FOLDER'] = 'progress'
+
+# Default for linearized ("fast web view") output, overridable per request
+app.config['LINEARIZE_OUTPUT'] = os.environ.get('LINEARIZE_OUTPUT', '').lower() in ('1', 'true', 'yes')
+
+# Admission control for the /api/ routes. Costs are weighted units per
+# request (see admission.OPERATION_WEIGHTS); rates are units per second.
+app.config['ADMISSION_ENABLED'] = os.environ.get('ADMISSION_ENABLED', '1').lower() in ('1', 'true', 'yes')
+app.config['ADMISSION_CLIENT_RATE'] = float(os.environ.get('ADMISSION_CLIENT_RATE', 2))
+app.config['ADMISSION_CLIENT_BURST'] = float(os.environ.get('ADMISSION_CLIENT_BURST', 60))
+app.config['ADMISSION_CLIENT_CONCURRENCY'] = int(os.environ.get('ADMISSION_CLIENT_CONCURRENCY', 2))
+app.config['ADMISSION_GLOBAL_RATE'] = float(os.environ.get('ADMISSION_GLOBAL_RATE', 10))
+app.config['ADMISSION_GLOBAL_BURST'] = float(os.environ.get('ADMISSION_GLOBAL_BURST', 200))
+app.config['ADMISSION_GLOBAL_CONCURRENCY'] = int(os.environ.get('ADMISSION_GLOBAL_CONCURRENCY', 8))
+app.config['ADMISSION_CLIENT_STREAMS'] = int(os.environ.get('ADMISSION_CLIENT_STREAMS', 2))
+app.config['ADMISSION_GLOBAL_STREAMS'] = int(os.environ.get('ADMISSION_GLOBAL_STREAMS', 4))
 
 # Ensure upload directories exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PROCESSED_FOLDER'], exist_ok=True)
+os.makedirs(app.config['PROGRESS_FOLDER'], exist_ok=True)
 
 # Import routes after app creation
 from routes import *
 
+# Admission control runs before every /api/ route
+from admission import init_admission
+init_admission(app)
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,110 @@
+"""Benchmark the write-time optimization pass on merged documents
+
+Builds a few representative source PDFs (scanned-style image pages and text
+pages sharing a font and an ICC profile), merges them in different mixes and
+compares a plain PdfWriter.write() against pdf_utils._write_pdf. The
+'estimated' column is the saving _write_pdf reports; 'smaller' is measured.
+
+Usage: python benchmarks/bench_write.py
+"""
+import os
+import sys
+import time
+import tempfile
+
+from PIL import Image
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, NameObject, NumberObject
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_utils import _write_pdf
+
+# Stand-in for an embedded sRGB profile, which real documents repeat per file
+ICC_PROFILE = os.urandom(3 * 1024)
+
+def make_image_pdf(path, pages=3):
+    """Create a PDF of noisy photo-like pages"""
+    images = [Image.effect_noise((600, 800), 40 + i).convert('RGB') for i in range(pages)]
+    images[0].save(path, 'PDF', save_all=True, append_images=images[1:])
+
+def make_text_pdf(path, pages=5):
+    """Create a PDF of text pages that share a font and an ICC profile"""
+    writer = PdfWriter()
+
+    font = DictionaryObject({
+        NameObject('/Type'): NameObject('/Font'),
+        NameObject('/Subtype'): NameObject('/Type1'),
+        NameObject('/BaseFont'): NameObject('/Helvetica'),
+    })
+    icc = DecodedStreamObject()
+    icc.set_data(ICC_PROFILE)
+    icc[NameObject('/N')] = NumberObject(3)
+    font_ref = writer._add_object(font)
+    icc_ref = writer._add_object(icc)
+
+    for i in range(pages):
+        page = PageObject.create_blank_page(None, 612, 792)
+        content = DecodedStreamObject()
+        content.set_data(f"BT /F1 24 Tf 72 700 Td (Page {i + 1}) Tj ET".encode())
+        page[NameObject('/Contents')] = writer._add_object(content)
+        page[NameObject('/Resources')] = DictionaryObject({
+            NameObject('/Font'): DictionaryObject({NameObject('/F1'): font_ref}),
+            NameObject('/ColorSpace'): DictionaryObject({
+                NameObject('/CS0'): ArrayObject([NameObject('/ICCBased'), icc_ref]),
+            }),
+        })
+        writer.add_page(page)
+
+    with open(path, 'wb') as output_file:
+        writer.write(output_file)
+
+def merge(input_paths):
+    writer = PdfWriter()
+    for input_path in input_paths:
+        for page in PdfReader(input_path).pages:
+            writer.add_page(page)
+    return writer
+
+def run_case(name, input_paths, work_dir):
+    plain_path = os.path.join(work_dir, f"{name}_plain.pdf")
+    optimized_path = os.path.join(work_dir, f"{name}_optimized.pdf")
+
+    start = time.perf_counter()
+    with open(plain_path, 'wb') as output_file:
+        merge(input_paths).write(output_file)
+    plain_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    saved = _write_pdf(merge(input_paths), optimized_path)
+    optimized_time = time.perf_counter() - start
+
+    plain_size = os.path.getsize(plain_path)
+    optimized_size = os.path.getsize(optimized_path)
+    print(
+        f"{name:<24} {len(input_paths):>7} {plain_size:>12} {optimized_size:>12} "
+        f"{100 * (plain_size - optimized_size) / plain_size:>7.1f}% {saved:>10} "
+        f"{plain_time * 1000:>9.1f} {optimized_time * 1000:>9.1f}"
+    )
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        images = os.path.join(work_dir, 'images.pdf')
+        text = [os.path.join(work_dir, f'text_{i}.pdf') for i in range(4)]
+        make_image_pdf(images)
+        for path in text:
+            make_text_pdf(path)
+
+        print(
+            f"{'case':<24} {'inputs':>7} {'plain B':>12} {'optimized B':>12} "
+            f"{'smaller':>8} {'estimated':>10} {'plain ms':>9} {'opt ms':>9}"
+        )
+        run_case('text_sources', text, work_dir)
+        run_case('same_scan_repeated', [images] * 4, work_dir)
+        run_case('mixed', [images, *text, images], work_dir)
+        run_case('single_source', [text[0]], work_dir)
+
+if __name__ == '__main__':
+    main()
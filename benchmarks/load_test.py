@@ -0,0 +1,490 @@
+"""Load test the /api/* routes and report latency, throughput and memory
+
+Starts the app under a local gunicorn (or targets --url), then drives every
+API route with a weighted mix of synthetic PDFs and images at increasing
+concurrency. For each stage it reports p50/p95/p99 latency, throughput
+(successful requests per second) and error rate per endpoint plus the peak
+server memory, and says at which concurrency throughput stops scaling.
+
+Like the web UI, the long operations send an operation_id and follow
+/api/progress/<operation_id> while they run. Those streams are reported on
+their own 'progress' row, where latency is how long a stream stayed open,
+and are left out of the totals.
+
+Memory per endpoint is measured in a separate pass before the stages, one
+request at a time, as the growth in resident size of the gunicorn process
+tree over each request. Under concurrent load only the whole server's peak
+is reported, since it cannot be split between the requests in flight.
+Admission control is disabled for the local server because every request
+comes from one address. The default server settings match the Procfile.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --levels 1,4,16 --duration 20 --workers 4 --threads 2
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --json before.json
+    python benchmarks/load_test.py --levels 1 --memory-repeats 10
+"""
+import os
+import sys
+import io
+import json
+import math
+import time
+import uuid
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_write import make_image_pdf, make_text_pdf
+from pdf_utils import protect_pdf_file
+
+PASSWORD = 'load-test'
+
+# Relative frequency of each route in the request mix
+ENDPOINT_MIX = {
+    'check-pdf-encryption': 4,
+    'merge-pdfs': 3,
+    'compress-pdf': 3,
+    'split-pdf': 2,
+    'reorder-pdf': 2,
+    'convert-images-to-pdf': 2,
+    'convert-pdf-to-images': 2,
+    'protect-pdf': 1,
+    'unlock-pdf': 1,
+}
+
+# Routes the web UI follows over the progress stream while they run
+PROGRESS_ENDPOINTS = {'convert-pdf-to-images', 'compress-pdf', 'merge-pdfs'}
+
+# A stage is saturated when throughput grows less than this over the previous stage
+SCALING_THRESHOLD = 1.1
+
+# Statuses that mean the server is overloaded rather than the request failing:
+# no response at all (refused or timed out), or rejected by admission control
+OVERLOAD_STATUSES = {0, 429, 503}
+SATURATION_OVERLOAD_RATE = 0.05
+
+# Seconds between server memory samples while measuring a single request
+MEMORY_SAMPLE_INTERVAL = 0.005
+
+def make_inputs(work_dir):
+    """Create the synthetic documents and images used in requests"""
+    paths = {
+        'text': os.path.join(work_dir, 'text.pdf'),
+        'scan': os.path.join(work_dir, 'scan.pdf'),
+        'protected': os.path.join(work_dir, 'protected.pdf'),
+        'photo': os.path.join(work_dir, 'photo.jpg'),
+        'diagram': os.path.join(work_dir, 'diagram.png'),
+    }
+    make_text_pdf(paths['text'], pages=12)
+    make_image_pdf(paths['scan'], pages=4)
+    protect_pdf_file(paths['text'], paths['protected'], PASSWORD)
+    Image.effect_noise((1600, 1200), 50).convert('RGB').save(paths['photo'], 'JPEG', quality=90)
+    Image.linear_gradient('L').resize((800, 800)).convert('RGB').save(paths['diagram'], 'PNG')
+
+    inputs = {}
+    for name, path in paths.items():
+        with open(path, 'rb') as input_file:
+            inputs[name] = (os.path.basename(path), input_file.read())
+    return inputs
+
+def build_request(endpoint, inputs, rng):
+    """Return (fields, files) for one request to endpoint"""
+    text, scan = inputs['text'], inputs['scan']
+    if endpoint == 'check-pdf-encryption':
+        return {}, [('file', rng.choice([text, scan, inputs['protected']]))]
+    if endpoint == 'merge-pdfs':
+        return {}, [('files', rng.choice([text, scan])) for _ in range(rng.randint(2, 4))]
+    if endpoint == 'compress-pdf':
+        return {'quality': str(rng.choice([30, 50, 80]))}, [('file', rng.choice([text, scan]))]
+    if endpoint == 'split-pdf':
+        if rng.random() < 0.5:
+            return {'split_type': 'all'}, [('file', scan)]
+        return {'split_type': 'range', 'page_range': '2-6'}, [('file', text)]
+    if endpoint == 'reorder-pdf':
+        order = list(range(1, 13))
+        rng.shuffle(order)
+        return {'page_order': ','.join(map(str, order))}, [('file', text)]
+    if endpoint == 'convert-images-to-pdf':
+        images = [inputs['photo'], inputs['diagram']]
+        return {'quality': '85'}, [('files', rng.choice(images)) for _ in range(rng.randint(1, 4))]
+    if endpoint == 'convert-pdf-to-images':
+        return {'quality': '85'}, [('file', rng.choice([text, scan]))]
+    if endpoint == 'protect-pdf':
+        return {'password': PASSWORD}, [('file', text)]
+    if endpoint == 'unlock-pdf':
+        return {'password': PASSWORD}, [('file', inputs['protected'])]
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, (filename, content) in files:
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode()
+        )
+        body.write(content)
+        body.write(b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+def send(base_url, endpoint, fields, files, timeout):
+    """POST one request, returning (status, latency seconds)"""
+    url = urlsplit(base_url)
+    body, content_type = encode_multipart(fields, files)
+    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+    start = time.perf_counter()
+    try:
+        connection.request('POST', f'/api/{endpoint}', body=body, headers={'Content-Type': content_type})
+        response = connection.getresponse()
+        response.read()
+        status = response.status
+    except (OSError, http.client.HTTPException):
+        status = 0
+    finally:
+        connection.close()
+    return status, time.perf_counter() - start
+
+def watch_progress(base_url, operation_id, timeout, finished):
+    """Follow the progress stream of an operation like EventSource does
+
+    Reconnects when the server ends the stream without a done event, until
+    that event arrives or finished is set. Returns (status, seconds open).
+    """
+    url = urlsplit(base_url)
+    start = time.perf_counter()
+    while True:
+        retry = 3.0
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+        try:
+            connection.request('GET', f'/api/progress/{operation_id}', headers={'Accept': 'text/event-stream'})
+            response = connection.getresponse()
+            status = response.status
+            if status != 200:
+                response.read()
+                return status, time.perf_counter() - start
+            for line in response:
+                if line.startswith(b'event: done'):
+                    return status, time.perf_counter() - start
+                if line.startswith(b'retry:'):
+                    retry = int(line[6:]) / 1000
+        except (OSError, ValueError, http.client.HTTPException):
+            return 0, time.perf_counter() - start
+        finally:
+            connection.close()
+
+        if finished.wait(retry):
+            return status, time.perf_counter() - start
+
+def process_tree_rss(pid):
+    """Resident memory of a process and its descendants in bytes, or None"""
+    total = 0
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f'/proc/{current}/status') as status_file:
+                for line in status_file:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as children_file:
+                    pending.extend(int(child) for child in children_file.read().split())
+    except (OSError, ValueError):
+        if total == 0:
+            return None
+    return total
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def run_stage(base_url, concurrency, duration, inputs, server_pid, seed, timeout):
+    """Drive the server at one concurrency level and collect per-endpoint stats"""
+    endpoints = list(ENDPOINT_MIX)
+    weights = [ENDPOINT_MIX[endpoint] for endpoint in endpoints]
+    results = defaultdict(list)
+    peak_memory = 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    stop_sampling = threading.Event()
+    watchers = []
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        while time.monotonic() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            fields, files = build_request(endpoint, inputs, rng)
+            finished = threading.Event()
+            if endpoint in PROGRESS_ENDPOINTS:
+                fields['operation_id'] = uuid.uuid4().hex
+                watcher = threading.Thread(target=progress, args=(fields['operation_id'], finished))
+                watcher.start()
+                with lock:
+                    watchers.append(watcher)
+            status, latency = send(base_url, endpoint, fields, files, timeout)
+            with lock:
+                results[endpoint].append((status, latency))
+            finished.set()
+
+    def progress(operation_id, finished):
+        status, latency = watch_progress(base_url, operation_id, timeout, finished)
+        with lock:
+            results['progress'].append((status, latency))
+
+    def sample_memory():
+        nonlocal peak_memory
+        while not stop_sampling.wait(0.1):
+            rss = process_tree_rss(server_pid) if server_pid else None
+            if rss is not None:
+                peak_memory = max(peak_memory, rss)
+
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.monotonic()
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.monotonic() - start
+    for thread in watchers:
+        thread.join()
+    stop_sampling.set()
+    sampler.join()
+
+    stage = {
+        'concurrency': concurrency,
+        'elapsed': elapsed,
+        'peak_rss_mb': peak_memory / (1024 * 1024) if peak_memory else None,
+        'endpoints': {},
+    }
+    for endpoint in [*endpoints, 'progress']:
+        samples = results.get(endpoint, [])
+        latencies = sorted(latency for _, latency in samples)
+        errors = sum(1 for status, _ in samples if not 200 <= status < 300)
+        stage['endpoints'][endpoint] = {
+            'requests': len(samples),
+            'throughput': (len(samples) - errors) / elapsed,
+            'error_rate': errors / len(samples) if samples else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+        }
+
+    requests = [sample for endpoint in endpoints for sample in results.get(endpoint, [])]
+    all_latencies = sorted(latency for _, latency in requests)
+    total = len(all_latencies)
+    statuses = [status for status, _ in requests]
+    errors = sum(1 for status in statuses if not 200 <= status < 300)
+    overloaded = sum(1 for status in statuses if status in OVERLOAD_STATUSES)
+    stage['total'] = {
+        'requests': total,
+        'throughput': (total - errors) / elapsed,
+        'error_rate': errors / total if total else 0.0,
+        'overload_rate': overloaded / total if total else 0.0,
+        'p50_ms': percentile(all_latencies, 0.50) * 1000,
+        'p95_ms': percentile(all_latencies, 0.95) * 1000,
+        'p99_ms': percentile(all_latencies, 0.99) * 1000,
+    }
+    return stage
+
+def measure_memory(base_url, inputs, server_pid, repeats, seed, timeout):
+    """Server memory growth per endpoint with one request in flight at a time
+
+    The gunicorn process tree is sampled while each request runs, and the
+    largest rise over its resident size just before the request is credited
+    to that endpoint.
+    """
+    rng = random.Random(seed)
+    report = {}
+    for endpoint in ENDPOINT_MIX:
+        peak_memory = 0
+        growth = 0
+        for _ in range(repeats):
+            fields, files = build_request(endpoint, inputs, rng)
+            baseline = process_tree_rss(server_pid)
+            if baseline is None:
+                continue
+            peak = baseline
+            finished = threading.Event()
+
+            def sample_memory():
+                nonlocal peak
+                while not finished.wait(MEMORY_SAMPLE_INTERVAL):
+                    peak = max(peak, process_tree_rss(server_pid) or 0)
+
+            sampler = threading.Thread(target=sample_memory, daemon=True)
+            sampler.start()
+            send(base_url, endpoint, fields, files, timeout)
+            finished.set()
+            sampler.join()
+            peak = max(peak, process_tree_rss(server_pid) or 0)
+
+            peak_memory = max(peak_memory, peak)
+            growth = max(growth, peak - baseline)
+        report[endpoint] = {
+            'requests': repeats,
+            'peak_rss_mb': peak_memory / (1024 * 1024),
+            'rss_growth_mb': growth / (1024 * 1024),
+        }
+    return report
+
+def find_saturation(stages):
+    """Concurrency at which goodput stops scaling or the server sheds load, or None
+
+    Only overload statuses count, so requests that fail even at the lowest
+    concurrency (e.g. a route rejecting its input) do not look like saturation.
+    """
+    for previous, stage in zip(stages, stages[1:]):
+        if stage['total']['overload_rate'] > SATURATION_OVERLOAD_RATE:
+            return stage['concurrency']
+        if stage['total']['throughput'] < previous['total']['throughput'] * SCALING_THRESHOLD:
+            return stage['concurrency']
+    return None
+
+def print_memory(report):
+    print("\nmemory, one request at a time")
+    print(f"{'endpoint':<24} {'reqs':>6} {'peak MB':>8} {'growth MB':>10}")
+    for endpoint, stats in report.items():
+        print(
+            f"{endpoint:<24} {stats['requests']:>6} {stats['peak_rss_mb']:>8.0f} "
+            f"{stats['rss_growth_mb']:>10.1f}"
+        )
+
+def print_stage(stage):
+    peak = stage['peak_rss_mb']
+    peak = f", server peak {peak:.0f} MB" if peak is not None else ''
+    print(f"\nconcurrency {stage['concurrency']} ({stage['elapsed']:.1f}s{peak})")
+    print(
+        f"{'endpoint':<24} {'reqs':>6} {'ok/s':>7} {'err%':>6} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    rows = list(stage['endpoints'].items()) + [('TOTAL', stage['total'])]
+    for endpoint, stats in rows:
+        print(
+            f"{endpoint:<24} {stats['requests']:>6} {stats['throughput']:>7.2f} "
+            f"{stats['error_rate'] * 100:>6.1f} {stats['p50_ms']:>8.0f} {stats['p95_ms']:>8.0f} "
+            f"{stats['p99_ms']:>8.0f}"
+        )
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(work_dir, workers, threads, admission):
+    """Start gunicorn in work_dir so uploads and outputs stay out of the repo"""
+    port = free_port()
+    env = dict(os.environ, ADMISSION_ENABLED='1' if admission else '0')
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--timeout', '300',
+        '--log-level', 'warning',
+        '--chdir', work_dir,
+        '--pythonpath', ROOT,
+    ]
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return server, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn did not start listening within 30s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='target a running server instead of starting gunicorn')
+    parser.add_argument('--levels', default='1,2,4,8,16', help='comma separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per concurrency level')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--admission', action='store_true', help='keep admission control enabled')
+    parser.add_argument('--timeout', type=float, default=120, help='per-request timeout in seconds')
+    parser.add_argument('--memory-repeats', type=int, default=3, help='requests per endpoint in the memory pass, 0 to skip')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        inputs = make_inputs(work_dir)
+
+        server = None
+        if args.url:
+            base_url = args.url
+        else:
+            server, base_url = start_server(work_dir, args.workers, args.threads, args.admission)
+
+        try:
+            memory = None
+            if server and args.memory_repeats > 0:
+                memory = measure_memory(base_url, inputs, server.pid, args.memory_repeats, args.seed, args.timeout)
+                print_memory(memory)
+
+            stages = []
+            for level in levels:
+                stage = run_stage(
+                    base_url, level, args.duration, inputs,
+                    server.pid if server else None, args.seed, args.timeout
+                )
+                print_stage(stage)
+                stages.append(stage)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    saturation = find_saturation(stages)
+    print()
+    for stage in stages:
+        total = stage['total']
+        print(
+            f"concurrency {stage['concurrency']:>3}: {total['throughput']:7.2f} ok req/s, "
+            f"p95 {total['p95_ms']:.0f} ms, errors {total['error_rate'] * 100:.1f}%, "
+            f"overloaded {total['overload_rate'] * 100:.1f}%"
+        )
+    if saturation:
+        print(f"Saturation starts at concurrency {saturation}")
+    else:
+        print("No saturation within the tested concurrency levels")
+
+    if args.json:
+        report = {
+            'target': args.url or f"gunicorn --workers {args.workers} --threads {args.threads}",
+            'duration': args.duration,
+            'memory': memory,
+            'stages': stages,
+            'saturation_concurrency': saturation,
+        }
+        with open(args.json, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,85 +1,408 @@
 import os
 import io
+import hashlib
+import mmap
+import re
+from contextlib import ExitStack, contextmanager
+import pikepdf
 from PyPDF2 import PdfReader, PdfWriter
-from pdf2image import convert_from_path
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+from pdf2image import convert_from_path, pdfinfo_from_path
 from PIL import Image
 import logging
 
 logger = logging.getLogger(__name__)
 
-def unlock_pdf_file(input_path, output_path, password):
-    """Remove password protection from a PDF file"""
+@contextmanager
+def open_pdf(input_path):
+    """Open a PDF for reading through a read-only memory map
+
+    PdfReader(path) copies the whole file into memory up front. Mapping it
+    instead lets the OS page in only the parts that objects are actually
+    resolved from. The reader must not be used after the block exits.
+    """
+    with open(input_path, 'rb') as input_file:
+        with mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield PdfReader(mapped)
+
+# Pages rendered per poppler call when converting a PDF to images
+RENDER_BATCH_PAGES = 5
+
+# Bytes read from each end of a file when estimating its page count
+PAGE_SCAN_BYTES = 64 * 1024
+PAGE_COUNT_PATTERN = re.compile(rb'/Type\s*/Pages\b.{0,256}?/Count\s+(\d+)|/Count\s+(\d+).{0,256}?/Type\s*/Pages\b', re.DOTALL)
+
+def scan_page_count(stream):
+    """Estimate the page count of a PDF stream without parsing it
+
+    Looks for the page tree root's /Count near the start and end of the
+    file, where writers usually put it. Returns 0 when it cannot be found,
+    e.g. when the page tree is inside a compressed object stream.
+    """
+    start = stream.tell()
     try:
-        reader = PdfReader(input_path)
-        
-        if reader.is_encrypted:
-            # Try to decrypt with the provided password
-            if not reader.decrypt(password):
-                logger.error("Failed to decrypt PDF with provided password")
-                return False
-        
-        writer = PdfWriter()
-        
-        # Copy all pages to the writer
-        for page in reader.pages:
-            writer.add_page(page)
-        
-        # Write the unlocked PDF
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
+        head = stream.read(PAGE_SCAN_BYTES)
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(max(len(head), size - PAGE_SCAN_BYTES))
+        tail = stream.read(PAGE_SCAN_BYTES)
+    finally:
+        stream.seek(start)
+    
+    counts = [int(a or b) for a, b in PAGE_COUNT_PATTERN.findall(head + tail)]
+    return max(counts, default=0)
+
+# Objects that must stay distinct even when their contents are identical
+UNIQUE_OBJECT_TYPES = ('/Catalog', '/Pages', '/Page', '/Annot')
+
+# /Type is optional on annotations, so they are also recognised by /Subtype
+ANNOTATION_SUBTYPES = (
+    '/Text', '/Link', '/FreeText', '/Line', '/Square', '/Circle', '/Polygon',
+    '/PolyLine', '/Highlight', '/Underline', '/Squiggly', '/StrikeOut', '/Stamp',
+    '/Caret', '/Ink', '/Popup', '/FileAttachment', '/Sound', '/Movie', '/Widget',
+    '/Screen', '/PrinterMark', '/TrapNet', '/Watermark', '/3D', '/Redact',
+)
+
+def _hash_pdf_object(obj, idnum, stream_digests):
+    """Return the content digest and serialized size of a writer object
+
+    Stream data is hashed once per object and cached in stream_digests, so
+    re-hashing a stream whose dictionary changed only serializes the
+    dictionary.
+    """
+    buffer = io.BytesIO()
+    if not isinstance(obj, StreamObject):
+        obj.write_to_stream(buffer, None)
+        serialized = buffer.getvalue()
+        return hashlib.sha256(b'obj' + serialized).digest(), len(serialized)
+    
+    if idnum not in stream_digests:
+        data = obj._data
+        if isinstance(data, str):
+            data = data.encode('latin-1')
+        stream_digests[idnum] = (hashlib.sha256(data).digest(), len(data))
+    data_digest, data_size = stream_digests[idnum]
+    
+    DictionaryObject.write_to_stream(obj, buffer, None)
+    serialized = buffer.getvalue()
+    return hashlib.sha256(b'stream' + serialized + data_digest).digest(), len(serialized) + data_size
+
+def _remap_references(obj, writer, mapping):
+    """Point indirect references to writer objects at their new object numbers
+
+    Returns whether any reference was changed.
+    """
+    changed = False
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        items = current.items() if isinstance(current, DictionaryObject) else enumerate(current)
+        for key, value in list(items):
+            if isinstance(value, IndirectObject):
+                if value.pdf is writer and value.idnum in mapping:
+                    current[key] = IndirectObject(mapping[value.idnum], 0, writer)
+                    changed = True
+            elif isinstance(value, (DictionaryObject, ArrayObject)):
+                stack.append(value)
+    return changed
+
+def _unique_object_ids(writer):
+    """Object numbers that may be shared by reference but never folded"""
+    unique = set()
+    for idnum, obj in enumerate(writer._objects, 1):
+        if not isinstance(obj, DictionaryObject):
+            continue
+        if obj.get('/Type') in UNIQUE_OBJECT_TYPES or obj.get('/Subtype') in ANNOTATION_SUBTYPES:
+            unique.add(idnum)
+        
+        # An annotation may appear on only one page, whatever its dictionary says
+        annots = obj.get('/Annots')
+        if isinstance(annots, IndirectObject):
+            annots = annots.get_object()
+        if isinstance(annots, ArrayObject):
+            unique.update(ref.idnum for ref in annots if isinstance(ref, IndirectObject))
+    return unique
+
+def _optimize_writer(writer, progress=None):
+    """Collapse duplicate objects and drop unreferenced ones before writing
+
+    Pages merged from several sources often carry identical fonts, ICC
+    profiles and images. Objects are hashed by their serialized contents
+    and duplicates are folded into one, repeating until nothing changes so
+    that parents whose children were folded can be folded too. Returns
+    estimates of the bytes saved and of the bytes left to write: the
+    serialized sizes of the dropped and the kept objects, ignoring xref
+    entries and object headers.
+    """
+    # Pull everything the pages reference from their source readers into the writer
+    writer._sweep_indirect_references(writer._root)
+    _report_progress(progress, 10, 100)
+    
+    trailer_refs = [writer._root, writer._info]
+    if hasattr(writer, '_encrypt'):
+        trailer_refs.append(writer._encrypt)
+    protected = {ref.idnum for ref in trailer_refs} | {writer._pages.idnum} | _unique_object_ids(writer)
+    
+    digests = {}
+    sizes = {}
+    stream_digests = {}
+    hashing = _scaled_progress(progress, 10, 60)
+    for idnum, obj in enumerate(writer._objects, 1):
+        if obj is not None:
+            digests[idnum], sizes[idnum] = _hash_pdf_object(obj, idnum, stream_digests)
+        _report_progress(hashing, idnum, len(writer._objects))
+    
+    # Fold identical objects into the first occurrence. Only objects whose
+    # references were remapped in a pass need hashing again for the next one.
+    candidates = [idnum for idnum in digests if idnum not in protected]
+    while True:
+        first_seen = {}
+        duplicates = {}
+        for idnum in candidates:
+            digest = digests[idnum]
+            if digest in first_seen:
+                duplicates[idnum] = first_seen[digest]
+            else:
+                first_seen[digest] = idnum
+        
+        if not duplicates:
+            break
+        
+        candidates = [idnum for idnum in candidates if idnum not in duplicates]
+        remaining = set(candidates)
+        for idnum, obj in enumerate(writer._objects, 1):
+            if not isinstance(obj, (DictionaryObject, ArrayObject)):
+                continue
+            if _remap_references(obj, writer, duplicates) and idnum in remaining:
+                digests[idnum], _ = _hash_pdf_object(obj, idnum, stream_digests)
+    _report_progress(progress, 80, 100)
+    
+    # Keep only objects reachable from the trailer
+    reachable = set()
+    stack = list(trailer_refs)
+    while stack:
+        current = stack.pop()
+        if isinstance(current, IndirectObject):
+            if current.pdf is not writer or current.idnum in reachable:
+                continue
+            reachable.add(current.idnum)
+            current = writer._objects[current.idnum - 1]
+        if isinstance(current, DictionaryObject):
+            stack.extend(current.values())
+        elif isinstance(current, ArrayObject):
+            stack.extend(current)
+    
+    # Renumber the surviving objects so the xref table stays contiguous
+    kept = sorted(reachable)
+    renumbered = {old: new for new, old in enumerate(kept, 1)}
+    writer._objects = [writer._objects[idnum - 1] for idnum in kept]
+    for idnum, obj in zip(kept, writer._objects):
+        if isinstance(obj, (DictionaryObject, ArrayObject)):
+            _remap_references(obj, writer, renumbered)
+        obj.indirect_reference = IndirectObject(renumbered[idnum], 0, writer)
+    
+    writer._root = IndirectObject(renumbered[writer._root.idnum], 0, writer)
+    writer._info = IndirectObject(renumbered[writer._info.idnum], 0, writer)
+    writer._pages = IndirectObject(renumbered[writer._pages.idnum], 0, writer)
+    if hasattr(writer, '_encrypt'):
+        writer._encrypt = IndirectObject(renumbered[writer._encrypt.idnum], 0, writer)
+    
+    # Hash lookups refer to the old object numbers
+    writer._idnum_hash = {}
+    _report_progress(progress, 100, 100)
+    
+    saved = sum(size for idnum, size in sizes.items() if idnum not in reachable)
+    return saved, sum(sizes[idnum] for idnum in kept if idnum in sizes)
+
+def _repack_pdf(path, password=None, linearize=False, progress=None):
+    """Rewrite a PDF in place with object streams, optionally linearized
+
+    PyPDF2 can neither pack objects into object streams nor linearize, so
+    the file is rewritten with pikepdf (libqpdf). Encryption is kept, which
+    needs the password to open the file. If the rewrite fails, the plain
+    output is left untouched.
+    """
+    tmp_path = f"{path}.repacked"
+    try:
+        with pikepdf.open(path, password=password or '') as pdf:
+            pdf.save(
+                tmp_path,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate,
+                compress_streams=True,
+                linearize=linearize,
+                encryption=bool(password),
+                progress=lambda percent: _report_progress(progress, percent, 100),
+            )
         
+        os.replace(tmp_path, path)
         return True
         
+    except pikepdf.PdfError as e:
+        logger.error(f"Error repacking PDF: {str(e)}")
+        return False
+        
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _write_pdf(writer, output_path, linearize=False, password=None, pack_objects=True, progress=None):
+    """Optimize and write a PdfWriter to disk, returning the estimated bytes saved
+
+    pack_objects=False skips the object-stream repack unless the output is
+    linearized, for small outputs where reparsing costs more than it saves.
+    """
+    repack = pack_objects or linearize
+    serialized = 60 if repack else 100
+    saved, expected_size = _optimize_writer(writer, _scaled_progress(progress, 0, 0.75 * serialized))
+    
+    with open(output_path, 'wb') as output_file:
+        writing = _scaled_progress(progress, 0.75 * serialized, serialized)
+        writer.write(_ProgressFile(output_file, expected_size, writing) if writing else output_file)
+    _report_progress(progress, serialized, 100)
+    
+    written_size = os.path.getsize(output_path)
+    if repack and _repack_pdf(output_path, password, linearize, _scaled_progress(progress, 60, 100)):
+        saved += written_size - os.path.getsize(output_path)
+    _report_progress(progress, 100, 100)
+    
+    logger.info(f"Optimized {os.path.basename(output_path)}: saved about {saved} bytes (estimate)")
+    return saved
+
+def _report_progress(progress, done, total):
+    """Call an optional progress(done, total) callback without letting it fail the operation"""
+    if progress is None:
+        return
+    try:
+        progress(done, total)
+    except Exception as e:
+        logger.warning(f"Progress callback failed: {str(e)}")
+
+def _scaled_progress(progress, start, end):
+    """Callback reporting one step's progress(done, total) as start..end percent of progress"""
+    if progress is None:
+        return None
+    
+    def report(done, total):
+        fraction = done / total if total else 1
+        _report_progress(progress, round(start + (end - start) * fraction, 1), 100)
+    
+    return report
+
+class _ProgressFile:
+    """Binary file wrapper reporting bytes written against an expected size
+
+    Serializing (and encrypting) a large document happens inside a single
+    PdfWriter.write() call, so progress is taken from the output instead.
+    Reports are limited to one per percent.
+    """
+    
+    def __init__(self, file, expected_size, progress):
+        self.file = file
+        self.expected_size = max(1, expected_size)
+        self.progress = progress
+        self.written = 0
+        self.next_report = 0
+    
+    def write(self, data):
+        self.written += len(data)
+        if self.written >= self.next_report:
+            self.next_report = self.written + self.expected_size // 100
+            _report_progress(self.progress, min(self.written, self.expected_size), self.expected_size)
+        return self.file.write(data)
+    
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+# Percent of an operation's progress spent copying pages; writing the output
+# (deduplicating, serializing and repacking) takes the rest
+COPY_PROGRESS = 40
+
+def unlock_pdf_file(input_path, output_path, password, linearize=False, progress=None):
+    """Remove password protection from a PDF file"""
+    try:
+        with open_pdf(input_path) as reader:
+            if reader.is_encrypted:
+                # Try to decrypt with the provided password
+                if not reader.decrypt(password):
+                    logger.error("Failed to decrypt PDF with provided password")
+                    return False
+            
+            writer = PdfWriter()
+            
+            # Copy all pages to the writer
+            copying = _scaled_progress(progress, 0, COPY_PROGRESS)
+            total = len(reader.pages)
+            for i, page in enumerate(reader.pages):
+                writer.add_page(page)
+                _report_progress(copying, i + 1, total)
+            
+            # Write the unlocked PDF
+            _write_pdf(writer, output_path, linearize, progress=_scaled_progress(progress, COPY_PROGRESS, 100))
+            
+            return True
+            
     except Exception as e:
         logger.error(f"Error unlocking PDF: {str(e)}")
         return False
 
-def protect_pdf_file(input_path, output_path, password):
+def protect_pdf_file(input_path, output_path, password, linearize=False, progress=None):
     """Add password protection to a PDF file"""
     try:
-        reader = PdfReader(input_path)
-        writer = PdfWriter()
-        
-        # Copy all pages to the writer
-        for page in reader.pages:
-            writer.add_page(page)
-        
-        # Add password protection
-        writer.encrypt(password)
-        
-        # Write the protected PDF
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-        
-        return True
-        
+        with open_pdf(input_path) as reader:
+            writer = PdfWriter()
+            
+            # Copy all pages to the writer
+            copying = _scaled_progress(progress, 0, COPY_PROGRESS)
+            total = len(reader.pages)
+            for i, page in enumerate(reader.pages):
+                writer.add_page(page)
+                _report_progress(copying, i + 1, total)
+            
+            # Add password protection
+            writer.encrypt(password)
+            
+            # Write the protected PDF
+            _write_pdf(writer, output_path, linearize, password, progress=_scaled_progress(progress, COPY_PROGRESS, 100))
+            
+            return True
+            
     except Exception as e:
         logger.error(f"Error protecting PDF: {str(e)}")
         return False
 
-def merge_pdf_files(input_paths, output_path):
+def merge_pdf_files(input_paths, output_path, linearize=False, progress=None):
     """Merge multiple PDF files into one"""
     try:
         writer = PdfWriter()
         
-        for input_path in input_paths:
-            reader = PdfReader(input_path)
+        # Sources stay mapped until the merged PDF has been written
+        with ExitStack() as readers:
+            sources = []
+            for input_path in input_paths:
+                reader = readers.enter_context(open_pdf(input_path))
+                
+                # If encrypted, try without password first
+                if reader.is_encrypted:
+                    try:
+                        reader.decrypt("")
+                    except:
+                        logger.warning(f"Could not decrypt {input_path}, skipping")
+                        continue
+                
+                sources.append(reader)
             
-            # If encrypted, try without password first
-            if reader.is_encrypted:
-                try:
-                    reader.decrypt("")
-                except:
-                    logger.warning(f"Could not decrypt {input_path}, skipping")
-                    continue
+            # Add all pages from each PDF
+            copying = _scaled_progress(progress, 0, COPY_PROGRESS)
+            total = sum(len(reader.pages) for reader in sources)
+            done = 0
+            for reader in sources:
+                for page in reader.pages:
+                    writer.add_page(page)
+                    done += 1
+                    _report_progress(copying, done, total)
             
-            # Add all pages from this PDF
-            for page in reader.pages:
-                writer.add_page(page)
-        
-        # Write the merged PDF
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
+            # Write the merged PDF
+            _write_pdf(writer, output_path, linearize, progress=_scaled_progress(progress, COPY_PROGRESS, 100))
         
         return True
         
@@ -87,124 +410,130 @@ def merge_pdf_files(input_paths, output_path):
         logger.error(f"Error merging PDFs: {str(e)}")
         return False
 
-def split_pdf_file(input_path, output_dir, split_type='all', page_range=''):
+def split_pdf_file(input_path, output_dir, split_type='all', page_range='', linearize=False, progress=None):
     """Split a PDF file into separate files"""
     try:
-        reader = PdfReader(input_path)
-        
-        if reader.is_encrypted:
-            try:
-                reader.decrypt("")
-            except:
-                logger.error("Cannot split encrypted PDF without password")
-                return False, []
-        
-        output_files = []
-        
-        if split_type == 'all':
-            # Split into individual pages
-            for i, page in enumerate(reader.pages):
-                writer = PdfWriter()
-                writer.add_page(page)
-                
-                output_filename = f"page_{i+1}.pdf"
-                output_path = os.path.join(output_dir, output_filename)
-                
-                with open(output_path, 'wb') as output_file:
-                    writer.write(output_file)
-                
-                output_files.append(output_path)
-        
-        elif split_type == 'range' and page_range:
-            # Split by page range
-            try:
-                if '-' in page_range:
-                    start, end = map(int, page_range.split('-'))
-                    start = max(1, start) - 1  # Convert to 0-based index
-                    end = min(len(reader.pages), end)
-                    
+        with open_pdf(input_path) as reader:
+            if reader.is_encrypted:
+                try:
+                    reader.decrypt("")
+                except:
+                    logger.error("Cannot split encrypted PDF without password")
+                    return False, []
+            
+            output_files = []
+            
+            if split_type == 'all':
+                # Split into individual pages
+                total = len(reader.pages)
+                for i, page in enumerate(reader.pages):
                     writer = PdfWriter()
-                    for i in range(start, end):
-                        writer.add_page(reader.pages[i])
+                    writer.add_page(page)
                     
-                    output_filename = f"pages_{start+1}-{end}.pdf"
+                    output_filename = f"page_{i+1}.pdf"
                     output_path = os.path.join(output_dir, output_filename)
                     
-                    with open(output_path, 'wb') as output_file:
-                        writer.write(output_file)
+                    # One repack per page would dominate the split
+                    _write_pdf(writer, output_path, linearize, pack_objects=False)
                     
                     output_files.append(output_path)
-                else:
-                    # Single page
-                    page_num = int(page_range) - 1
-                    if 0 <= page_num < len(reader.pages):
+                    _report_progress(progress, i + 1, total)
+            
+            elif split_type == 'range' and page_range:
+                # Split by page range
+                try:
+                    if '-' in page_range:
+                        start, end = map(int, page_range.split('-'))
+                        start = max(1, start) - 1  # Convert to 0-based index
+                        end = min(len(reader.pages), end)
+                        
                         writer = PdfWriter()
-                        writer.add_page(reader.pages[page_num])
+                        copying = _scaled_progress(progress, 0, COPY_PROGRESS)
+                        for i in range(start, end):
+                            writer.add_page(reader.pages[i])
+                            _report_progress(copying, i - start + 1, end - start)
                         
-                        output_filename = f"page_{page_num+1}.pdf"
+                        output_filename = f"pages_{start+1}-{end}.pdf"
                         output_path = os.path.join(output_dir, output_filename)
                         
-                        with open(output_path, 'wb') as output_file:
-                            writer.write(output_file)
+                        _write_pdf(writer, output_path, linearize, progress=_scaled_progress(progress, COPY_PROGRESS, 100))
                         
                         output_files.append(output_path)
-            except ValueError:
-                logger.error("Invalid page range format")
-                return False, []
-        
-        return True, output_files
-        
+                    else:
+                        # Single page
+                        page_num = int(page_range) - 1
+                        if 0 <= page_num < len(reader.pages):
+                            writer = PdfWriter()
+                            writer.add_page(reader.pages[page_num])
+                            
+                            output_filename = f"page_{page_num+1}.pdf"
+                            output_path = os.path.join(output_dir, output_filename)
+                            
+                            _write_pdf(writer, output_path, linearize)
+                            
+                            output_files.append(output_path)
+                except ValueError:
+                    logger.error("Invalid page range format")
+                    return False, []
+            
+            return True, output_files
+            
     except Exception as e:
         logger.error(f"Error splitting PDF: {str(e)}")
         return False, []
 
-def reorder_pdf_pages(input_path, output_path, page_indices):
+def reorder_pdf_pages(input_path, output_path, page_indices, linearize=False, progress=None):
     """Reorder pages in a PDF file"""
     try:
-        reader = PdfReader(input_path)
-        
-        if reader.is_encrypted:
-            try:
-                reader.decrypt("")
-            except:
-                logger.error("Cannot reorder encrypted PDF without password")
-                return False
-        
-        writer = PdfWriter()
-        
-        # Validate page indices
-        max_pages = len(reader.pages)
-        for index in page_indices:
-            if 0 <= index < max_pages:
-                writer.add_page(reader.pages[index])
-            else:
-                logger.warning(f"Invalid page index: {index + 1}")
-        
-        # Write the reordered PDF
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-        
-        return True
-        
+        with open_pdf(input_path) as reader:
+            if reader.is_encrypted:
+                try:
+                    reader.decrypt("")
+                except:
+                    logger.error("Cannot reorder encrypted PDF without password")
+                    return False
+            
+            writer = PdfWriter()
+            
+            # Validate page indices
+            copying = _scaled_progress(progress, 0, COPY_PROGRESS)
+            max_pages = len(reader.pages)
+            for i, index in enumerate(page_indices):
+                if 0 <= index < max_pages:
+                    writer.add_page(reader.pages[index])
+                else:
+                    logger.warning(f"Invalid page index: {index + 1}")
+                _report_progress(copying, i + 1, len(page_indices))
+            
+            # Write the reordered PDF
+            _write_pdf(writer, output_path, linearize, progress=_scaled_progress(progress, COPY_PROGRESS, 100))
+            
+            return True
+            
     except Exception as e:
         logger.error(f"Error reordering PDF: {str(e)}")
         return False
 
-def convert_pdf_to_images(input_path, output_dir, quality=95):
+def convert_pdf_to_images(input_path, output_dir, quality=95, progress=None):
     """Convert PDF pages to JPEG images"""
     try:
-        # Convert PDF to images
-        images = convert_from_path(input_path, dpi=150)
+        total = pdfinfo_from_path(input_path)['Pages']
         
         output_files = []
         
-        for i, image in enumerate(images):
-            output_filename = f"page_{i+1}.jpg"
-            output_path = os.path.join(output_dir, output_filename)
+        # Render a few pages at a time so progress can be reported as pages finish
+        for first_page in range(1, total + 1, RENDER_BATCH_PAGES):
+            last_page = min(total, first_page + RENDER_BATCH_PAGES - 1)
+            images = convert_from_path(input_path, dpi=150, first_page=first_page, last_page=last_page)
             
-            # Save with specified quality
-            image.save(output_path, 'JPEG', quality=quality, optimize=True)
-            output_files.append(output_path)
+            for i, image in enumerate(images, first_page):
+                output_filename = f"page_{i}.jpg"
+                output_path = os.path.join(output_dir, output_filename)
+                
+                # Save with specified quality
+                image.save(output_path, 'JPEG', quality=quality, optimize=True)
+                output_files.append(output_path)
+                _report_progress(progress, i, total)
         
         return True, output_files
         
@@ -212,12 +541,13 @@ def convert_pdf_to_images(input_path, output_dir, quality=95):
         logger.error(f"Error converting PDF to images: {str(e)}")
         return False, []
 
-def convert_images_to_pdf(input_paths, output_path, quality=95):
+def convert_images_to_pdf(input_paths, output_path, quality=95, linearize=False, progress=None):
     """Convert multiple images to a single PDF"""
     try:
         images = []
         
-        for input_path in input_paths:
+        loading = _scaled_progress(progress, 0, COPY_PROGRESS)
+        for i, input_path in enumerate(input_paths):
             # Open and process each image
             img = Image.open(input_path)
             
@@ -230,6 +560,7 @@ def convert_images_to_pdf(input_paths, output_path, quality=95):
             img.thumbnail(max_size, Image.Resampling.LANCZOS)
             
             images.append(img)
+            _report_progress(loading, i + 1, len(input_paths))
         
         if images:
             # Save all images as a single PDF
@@ -244,6 +575,10 @@ def convert_images_to_pdf(input_paths, output_path, quality=95):
                 quality=quality,
                 optimize=True
             )
+            _report_progress(progress, 60, 100)
+            
+            _repack_pdf(output_path, linearize=linearize, progress=_scaled_progress(progress, 60, 100))
+        _report_progress(progress, 100, 100)
         
         return True
         
@@ -251,31 +586,32 @@ def convert_images_to_pdf(input_paths, output_path, quality=95):
         logger.error(f"Error converting images to PDF: {str(e)}")
         return False
 
-def compress_pdf_file(input_path, output_path, quality=50):
+def compress_pdf_file(input_path, output_path, quality=50, linearize=False, progress=None):
     """Compress a PDF file by reducing image quality"""
     try:
         # For basic compression, we'll recreate the PDF
-        reader = PdfReader(input_path)
-        
-        if reader.is_encrypted:
-            try:
-                reader.decrypt("")
-            except:
-                logger.error("Cannot compress encrypted PDF without password")
-                return False
-        
-        writer = PdfWriter()
-        
-        # Copy all pages (PyPDF2 will automatically compress)
-        for page in reader.pages:
-            writer.add_page(page)
-        
-        # Write with compression
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-        
-        return True
-        
+        with open_pdf(input_path) as reader:
+            if reader.is_encrypted:
+                try:
+                    reader.decrypt("")
+                except:
+                    logger.error("Cannot compress encrypted PDF without password")
+                    return False
+            
+            writer = PdfWriter()
+            
+            # Copy all pages (PyPDF2 will automatically compress)
+            copying = _scaled_progress(progress, 0, COPY_PROGRESS)
+            total = len(reader.pages)
+            for i, page in enumerate(reader.pages):
+                writer.add_page(page)
+                _report_progress(copying, i + 1, total)
+            
+            # Write with compression
+            _write_pdf(writer, output_path, linearize, progress=_scaled_progress(progress, COPY_PROGRESS, 100))
+            
+            return True
+            
     except Exception as e:
         logger.error(f"Error compressing PDF: {str(e)}")
         return False
@@ -0,0 +1,130 @@
+import os
+import re
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between progress updates written for one operation
+PROGRESS_INTERVAL = 0.25
+
+# How often the event stream checks for new progress
+POLL_INTERVAL = 0.25
+
+# Seconds of silence after which the event stream sends a keep-alive comment
+KEEPALIVE_INTERVAL = 15
+
+# Seconds without any update after which an operation is considered lost
+IDLE_TIMEOUT = 300
+
+# Seconds the event stream waits for an operation to start before closing.
+# Browsers reconnect after RETRY_DELAY milliseconds, which covers uploads
+# still in progress without holding a worker thread for unknown ids.
+START_TIMEOUT = 5
+RETRY_DELAY = 2000
+
+# Progress files older than this are removed when new operations start
+STALE_AFTER = 3600
+
+OPERATION_ID_PATTERN = re.compile(r'^[A-Za-z0-9-]{8,64}$')
+
+def valid_operation_id(operation_id):
+    return bool(operation_id) and OPERATION_ID_PATTERN.match(operation_id) is not None
+
+def _progress_path(folder, operation_id):
+    return os.path.join(folder, f"{operation_id}.json")
+
+def write_progress(folder, operation_id, state):
+    """Atomically replace the stored progress of an operation"""
+    path = _progress_path(folder, operation_id)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as progress_file:
+        json.dump(state, progress_file)
+    os.replace(tmp_path, path)
+
+def read_progress(folder, operation_id):
+    try:
+        with open(_progress_path(folder, operation_id)) as progress_file:
+            return json.load(progress_file)
+    except (OSError, ValueError):
+        return None
+
+def remove_stale_progress(folder):
+    cutoff = time.time() - STALE_AFTER
+    for entry in os.scandir(folder):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+class ProgressReporter:
+    """Progress callback for pdf_utils, throttled to PROGRESS_INTERVAL
+
+    State is kept in small JSON files so the event stream can be served by
+    any worker process, not just the one running the operation.
+    """
+
+    def __init__(self, folder, operation_id):
+        self.folder = folder
+        self.operation_id = operation_id
+        self.last_write = 0
+        remove_stale_progress(folder)
+        self._write({'done': 0, 'total': 0, 'finished': False})
+
+    def _write(self, state):
+        try:
+            write_progress(self.folder, self.operation_id, state)
+        except OSError as e:
+            # Progress is best effort and must never fail the operation
+            logger.warning(f"Could not record progress for {self.operation_id}: {str(e)}")
+        self.last_write = time.monotonic()
+
+    def __call__(self, done, total):
+        if done < total and time.monotonic() - self.last_write < PROGRESS_INTERVAL:
+            return
+        self._write({'done': done, 'total': total, 'finished': False})
+
+    def finish(self, success):
+        state = read_progress(self.folder, self.operation_id) or {'done': 0, 'total': 0}
+        state.update({'finished': True, 'success': bool(success)})
+        self._write(state)
+
+def _event(name, state):
+    return f"event: {name}\ndata: {json.dumps(state)}\n\n"
+
+def stream_progress(folder, operation_id):
+    """Yield Server-Sent Events for an operation until it finishes"""
+    last_state = None
+    started = last_change = last_sent = time.monotonic()
+
+    while True:
+        state = read_progress(folder, operation_id)
+        now = time.monotonic()
+
+        if state is not None and state != last_state:
+            last_state = state
+            last_change = last_sent = now
+            if state.get('finished'):
+                yield _event('done', state)
+                try:
+                    os.remove(_progress_path(folder, operation_id))
+                except OSError:
+                    pass
+                return
+            yield _event('progress', state)
+
+        elif last_state is None and now - started > START_TIMEOUT:
+            yield f"retry: {RETRY_DELAY}\n\n"
+            return
+
+        elif now - last_change > IDLE_TIMEOUT:
+            yield _event('done', {'finished': True, 'success': False, 'error': 'timeout'})
+            return
+
+        elif now - last_sent > KEEPALIVE_INTERVAL:
+            last_sent = now
+            yield ": keep-alive\n\n"
+
+        time.sleep(POLL_INTERVAL)
@@ -1,13 +1,14 @@
 import os
 import uuid
 import zipfile
-from flask import render_template, request, jsonify, send_file, flash, redirect, url_for, current_app
+from flask import render_template, request, jsonify, send_file, flash, redirect, url_for, current_app, Response
 from werkzeug.utils import secure_filename
 from pdf_utils import (
     unlock_pdf_file, protect_pdf_file, merge_pdf_files, split_pdf_file,
     reorder_pdf_pages, convert_pdf_to_images as pdf_to_images_util,
-    convert_images_to_pdf as images_to_pdf_util, compress_pdf_file
+    convert_images_to_pdf as images_to_pdf_util, compress_pdf_file, open_pdf
 )
+from progress import ProgressReporter, valid_operation_id, stream_progress
 from app import app
 
 ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png'}
@@ -17,6 +18,24 @@ def allowed_file(filename):
         return False
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def linearize_requested():
+    """Whether the output should be linearized for fast web view"""
+    value = request.form.get('linearize')
+    if value is None:
+        return current_app.config['LINEARIZE_OUTPUT']
+    return value.lower() in ('1', 'true', 'on', 'yes')
+
+def progress_reporter():
+    """Progress callback for the operation id the client sent, if any"""
+    operation_id = request.form.get('operation_id', '')
+    if not valid_operation_id(operation_id):
+        return None
+    return ProgressReporter(current_app.config['PROGRESS_FOLDER'], operation_id)
+
+def finish_progress(progress, success):
+    if progress is not None:
+        progress.finish(success)
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -74,7 +93,9 @@ def unlock_pdf():
         output_filename = f"unlocked_{filename}"
         output_path = os.path.join(current_app.config['PROCESSED_FOLDER'], output_filename)
         
-        success = unlock_pdf_file(input_path, output_path, password)
+        progress = progress_reporter()
+        success = unlock_pdf_file(input_path, output_path, password, linearize_requested(), progress)
+        finish_progress(progress, success)
         
         # Clean up input file
         os.remove(input_path)
@@ -116,7 +137,9 @@ def protect_pdf():
         output_filename = f"protected_{filename}"
         output_path = os.path.join(current_app.config['PROCESSED_FOLDER'], output_filename)
         
-        success = protect_pdf_file(input_path, output_path, password)
+        progress = progress_reporter()
+        success = protect_pdf_file(input_path, output_path, password, linearize_requested(), progress)
+        finish_progress(progress, success)
         
         # Clean up input file
         os.remove(input_path)
@@ -161,7 +184,9 @@ def merge_pdfs():
         output_filename = f"merged_{uuid.uuid4()}.pdf"
         output_path = os.path.join(current_app.config['PROCESSED_FOLDER'], output_filename)
         
-        success = merge_pdf_files(input_paths, output_path)
+        progress = progress_reporter()
+        success = merge_pdf_files(input_paths, output_path, linearize_requested(), progress)
+        finish_progress(progress, success)
         
         # Clean up input files
         for path in input_paths:
@@ -202,7 +227,9 @@ def split_pdf():
         output_dir = os.path.join(current_app.config['PROCESSED_FOLDER'], f"split_{uuid.uuid4()}")
         os.makedirs(output_dir, exist_ok=True)
         
-        success, output_files = split_pdf_file(input_path, output_dir, split_type, page_range)
+        progress = progress_reporter()
+        success, output_files = split_pdf_file(input_path, output_dir, split_type, page_range, linearize_requested(), progress)
+        finish_progress(progress, success and output_files)
         
         # Clean up input file
         os.remove(input_path)
@@ -273,7 +300,9 @@ def reorder_pdf():
         output_filename = f"reordered_{filename}"
         output_path = os.path.join(current_app.config['PROCESSED_FOLDER'], output_filename)
         
-        success = reorder_pdf_pages(input_path, output_path, page_indices)
+        progress = progress_reporter()
+        success = reorder_pdf_pages(input_path, output_path, page_indices, linearize_requested(), progress)
+        finish_progress(progress, success)
         
         # Clean up input file
         os.remove(input_path)
@@ -312,7 +341,9 @@ def convert_pdf_to_images():
         output_dir = os.path.join(current_app.config['PROCESSED_FOLDER'], f"images_{uuid.uuid4()}")
         os.makedirs(output_dir, exist_ok=True)
         
-        success, image_files = pdf_to_images_util(input_path, output_dir, quality)
+        progress = progress_reporter()
+        success, image_files = pdf_to_images_util(input_path, output_dir, quality, progress)
+        finish_progress(progress, success and image_files)
         
         # Clean up input file
         os.remove(input_path)
@@ -371,7 +402,9 @@ def convert_images_to_pdf():
         output_filename = f"converted_{uuid.uuid4()}.pdf"
         output_path = os.path.join(current_app.config['PROCESSED_FOLDER'], output_filename)
         
-        success = images_to_pdf_util(input_paths, output_path, quality)
+        progress = progress_reporter()
+        success = images_to_pdf_util(input_paths, output_path, quality, linearize_requested(), progress)
+        finish_progress(progress, success)
         
         # Clean up input files
         for path in input_paths:
@@ -407,10 +440,9 @@ def check_pdf_encryption():
         file.save(input_path)
         
         try:
-            from PyPDF2 import PdfReader
-            reader = PdfReader(input_path)
-            is_encrypted = reader.is_encrypted
-            page_count = len(reader.pages) if not is_encrypted else 0
+            with open_pdf(input_path) as reader:
+                is_encrypted = reader.is_encrypted
+                page_count = len(reader.pages) if not is_encrypted else 0
             
             # Clean up temp file
             os.remove(input_path)
@@ -458,7 +490,9 @@ def compress_pdf():
         output_filename = f"compressed_{filename}"
         output_path = os.path.join(current_app.config['PROCESSED_FOLDER'], output_filename)
         
-        success = compress_pdf_file(input_path, output_path, quality)
+        progress = progress_reporter()
+        success = compress_pdf_file(input_path, output_path, quality, linearize_requested(), progress)
+        finish_progress(progress, success)
         
         # Clean up input file
         os.remove(input_path)
@@ -472,6 +506,17 @@ def compress_pdf():
         current_app.logger.error(f"Error compressing PDF: {str(e)}")
         return jsonify({'error': 'An error occurred while processing the file'}), 500
 
+@app.route('/api/progress/<operation_id>')
+def operation_progress(operation_id):
+    if not valid_operation_id(operation_id):
+        return jsonify({'error': 'Invalid operation id'}), 400
+    
+    return Response(
+        stream_progress(current_app.config['PROGRESS_FOLDER'], operation_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/download/<filename>')
 def download_file(filename):
     try:
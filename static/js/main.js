@@ -386,6 +386,56 @@ function downloadBlob(blob, filename) {
     window.URL.revokeObjectURL(url);
 }
 
+/**
+ * Create a random id for tracking a long-running operation
+ * @returns {string} Operation id
+ */
+function createOperationId() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(16) + '-' + Math.random().toString(16).slice(2);
+}
+
+/**
+ * Drive a progress bar from the server's progress events for an operation.
+ * Adds an operation_id to the form data so the server reports progress for it.
+ * @param {FormData} formData - Form data about to be submitted
+ * @param {HTMLElement} progressBar - Progress bar element
+ * @returns {Object} Tracker with a stop() method
+ */
+function trackOperationProgress(formData, progressBar) {
+    const operationId = createOperationId();
+    formData.append('operation_id', operationId);
+
+    if (!window.EventSource) {
+        return { stop() {} };
+    }
+
+    const source = new EventSource(`/api/progress/${operationId}`);
+
+    source.addEventListener('progress', function(e) {
+        const state = JSON.parse(e.data);
+        if (state.total > 0) {
+            // Keep some room for sending the result back after processing
+            const percent = Math.min(95, Math.round(state.done / state.total * 95));
+            progressBar.style.width = percent + '%';
+            progressBar.textContent = `${Math.round(state.done / state.total * 100)}%`;
+        }
+    });
+
+    source.addEventListener('done', function() {
+        source.close();
+    });
+
+    return {
+        stop() {
+            source.close();
+            progressBar.textContent = '';
+        }
+    };
+}
+
 // Export functions for use in other files
 window.PDFTools = {
     setupFileDropZone,
@@ -396,5 +446,6 @@ window.PDFTools = {
     animateProgress,
     debounce,
     copyToClipboard,
-    downloadBlob
+    downloadBlob,
+    trackOperationProgress
 };
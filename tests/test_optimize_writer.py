@@ -0,0 +1,127 @@
+"""Behavior checks for the write-time optimization pass in pdf_utils
+
+_optimize_writer rewrites PyPDF2's private writer state (object table,
+trailer references), so these tests read the written files back and check
+what a viewer would see rather than the writer internals.
+"""
+import os
+import sys
+
+from PyPDF2 import PageObject, PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject,
+    NumberObject, TextStringObject
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_utils import _optimize_writer, _write_pdf, protect_pdf_file
+
+def make_page(writer, text):
+    """Add a page showing text, with a font dictionary of its own"""
+    page = PageObject.create_blank_page(None, 612, 792)
+    content = DecodedStreamObject()
+    content.set_data(f"BT /F1 24 Tf 72 700 Td ({text}) Tj ET".encode())
+    page[NameObject('/Contents')] = writer._add_object(content)
+    page[NameObject('/Resources')] = DictionaryObject({
+        NameObject('/Font'): DictionaryObject({
+            NameObject('/F1'): writer._add_object(DictionaryObject({
+                NameObject('/Type'): NameObject('/Font'),
+                NameObject('/Subtype'): NameObject('/Type1'),
+                NameObject('/BaseFont'): NameObject('/Helvetica'),
+            })),
+        }),
+    })
+    writer.add_page(page)
+    return writer.pages[-1]
+
+def link_annotation():
+    """A URI link annotation without the optional /Type /Annot"""
+    return DictionaryObject({
+        NameObject('/Subtype'): NameObject('/Link'),
+        NameObject('/Rect'): ArrayObject([FloatObject(72), FloatObject(72), FloatObject(200), FloatObject(100)]),
+        NameObject('/Border'): ArrayObject([NumberObject(0), NumberObject(0), NumberObject(0)]),
+        NameObject('/A'): DictionaryObject({
+            NameObject('/S'): NameObject('/URI'),
+            NameObject('/URI'): TextStringObject('https://example.com/'),
+        }),
+    })
+
+def page_text(page):
+    return page.extract_text().strip()
+
+def test_identical_link_annotations_stay_separate_per_page(tmp_path):
+    writer = PdfWriter()
+    for i in range(3):
+        page = make_page(writer, f"Page {i + 1}")
+        page[NameObject('/Annots')] = ArrayObject([writer._add_object(link_annotation())])
+
+    output_path = tmp_path / 'links.pdf'
+    _write_pdf(writer, str(output_path), pack_objects=False)
+
+    reader = PdfReader(str(output_path))
+    annotations = [page['/Annots'][0] for page in reader.pages]
+    assert len({ref.idnum for ref in annotations}) == 3
+    for annotation in annotations:
+        assert annotation.get_object()['/A']['/URI'] == 'https://example.com/'
+
+def test_identical_fonts_are_folded(tmp_path):
+    writer = PdfWriter()
+    for i in range(3):
+        make_page(writer, f"Page {i + 1}")
+
+    output_path = tmp_path / 'fonts.pdf'
+    saved = _write_pdf(writer, str(output_path), pack_objects=False)
+
+    reader = PdfReader(str(output_path))
+    fonts = {page['/Resources']['/Font'].raw_get('/F1').idnum for page in reader.pages}
+    assert len(fonts) == 1
+    assert saved > 0
+    assert [page_text(page) for page in reader.pages] == ['Page 1', 'Page 2', 'Page 3']
+
+def test_encrypted_output_decrypts_after_renumbering(tmp_path):
+    writer = PdfWriter()
+    for i in range(4):
+        make_page(writer, f"Page {i + 1}")
+    input_path = tmp_path / 'plain.pdf'
+    with open(input_path, 'wb') as output_file:
+        writer.write(output_file)
+
+    output_path = tmp_path / 'protected.pdf'
+    assert protect_pdf_file(str(input_path), str(output_path), 'secret')
+
+    reader = PdfReader(str(output_path))
+    assert reader.is_encrypted
+    assert reader.decrypt('secret')
+    assert [page_text(page) for page in reader.pages] == ['Page 1', 'Page 2', 'Page 3', 'Page 4']
+
+def test_outlines_and_destinations_point_at_their_pages(tmp_path):
+    writer = PdfWriter()
+    for i in range(4):
+        make_page(writer, f"Page {i + 1}")
+    writer.add_outline_item('Third', 2)
+    writer.add_outline_item('First', 0)
+    writer.add_named_destination('last', 3)
+
+    output_path = tmp_path / 'outline.pdf'
+    _write_pdf(writer, str(output_path))
+
+    reader = PdfReader(str(output_path))
+    outline = {item.title: reader.get_destination_page_number(item) for item in reader.outline}
+    assert outline == {'Third': 2, 'First': 0}
+    destination = reader.named_destinations['last']
+    assert reader.get_destination_page_number(destination) == 3
+    assert page_text(reader.pages[3]) == 'Page 4'
+
+def test_unreferenced_objects_are_dropped():
+    writer = PdfWriter()
+    make_page(writer, 'Page 1')
+    orphan = writer._add_object(DictionaryObject({NameObject('/Orphan'): NumberObject(1)}))
+    orphan_object = orphan.get_object()
+
+    saved, written = _optimize_writer(writer)
+
+    assert all(obj is not orphan_object for obj in writer._objects)
+    assert saved > 0 and written > 0
+    # Object numbers stay contiguous after the orphan is removed
+    assert all(obj.indirect_reference.idnum == idnum for idnum, obj in enumerate(writer._objects, 1))